@@ -1,113 +1,255 @@
+import asyncio
 import boto3
 import json
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+
+try:
+    # Optional: share one event loop across regions instead of a thread per region
+    import aioboto3
+    from aiobotocore.config import AioConfig
+except ImportError:
+    aioboto3 = None
+
+try:
+    # Optional: faster dashboard serialization
+    import orjson
+except ImportError:
+    orjson = None
 
 SNS_TOPIC_ARN = 'arn:aws:sns:ap-south-1:970378220457:stale-ebs-topic'  # Update as needed
 REGION = 'ap-south-1'  # Region for SNS and Dashboard placement
 DRY_RUN = True # Set to True to test without deleting
 NOTIFY_ONLY = True # Set to True to only notify without deleting
 STALE_DAYS_THRESHOLD = 7 # Days threshold for identifying stale volumes
+DEFAULT_REGIONS = () # Regions to scan, e.g. ('us-east-1', 'ap-south-1'); empty = discover enabled regions
+MAX_REGION_WORKERS = 16 # Regions processed concurrently
+MAX_DELETE_WORKERS = 20 # Volume deletions issued concurrently per region
+REPORT_BUCKET = '' # S3 bucket for the full stale volume and deletion lists; empty = dashboard shows truncated lists only
+REPORT_PREFIX = 'stale-ebs-reports/' # Key prefix for reports written to REPORT_BUCKET
+MAX_INLINE_REPORT_LINES = 50 # Stale volume IDs / deletion results shown directly on the dashboard
+MAX_METRIC_DATA_PER_CALL = 1000 # PutMetricData entry limit per request
+
+# Shared client config: a larger connection pool for the worker threads, kept-alive
+# connections across warm starts and adaptive retries to absorb throttling
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+if aioboto3 is not None:
+    ASYNC_BOTO_CONFIG = AioConfig(
+        max_pool_connections=50,
+        retries={'mode': 'adaptive', 'max_attempts': 10}
+    )
+
+# Region list and per-region clients cached across warm Lambda invocations
+_REGIONS_CACHE = None
+_EC2_CLIENTS = {}
+
+cloudwatch_main = boto3.client('cloudwatch', region_name=REGION, config=BOTO_CONFIG)
+sns = boto3.client('sns', region_name=REGION, config=BOTO_CONFIG)
+s3 = boto3.client('s3', region_name=REGION, config=BOTO_CONFIG)
+
+def ec2_for(region):
+    client = _EC2_CLIENTS.get(region)
+    if client is None:
+        client = _EC2_CLIENTS[region] = boto3.client('ec2', region_name=region, config=BOTO_CONFIG)
+    return client
+
+def upload_report(body, report_name, report_time):
+    # Store a full report list in S3 and return a console link to it
+    key = f"{REPORT_PREFIX}{report_time:%Y-%m-%dT%H-%M-%SZ}-{report_name}.txt"
+    s3.put_object(Bucket=REPORT_BUCKET, Key=key, Body=body.encode(), ContentType='text/plain')
+    return f"https://s3.console.aws.amazon.com/s3/object/{REPORT_BUCKET}?prefix={key}"
+
+def dashboard_excerpt(lines, full_str, empty_message, report_name, report_time):
+    # Dashboard shows the first lines only; the full list is linked from S3 when configured
+    if not lines:
+        return empty_message, ""
+    hidden_count = len(lines) - MAX_INLINE_REPORT_LINES
+    if hidden_count <= 0:
+        return full_str, ""
+    more_str = f"\n{hidden_count} more not shown."
+    if REPORT_BUCKET:
+        # The S3 report is optional, so a failed upload must not fail the run
+        try:
+            more_str += f" [View full list]({upload_report(full_str, report_name, report_time)})"
+        except Exception as e:
+            print(f"Could not upload {report_name} report to S3: {str(e)}")
+    return '\n'.join(lines[:MAX_INLINE_REPORT_LINES]), more_str
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def summarize_region(region, volumes, current_time, threshold_time):
+    # Count all and unattached volumes, and filter stale ones by age, in one pass
+    total_count = 0
+    available_count = 0
+    stale_ids = []
+    for vol in volumes:
+        total_count += 1
+        if vol['State'] == 'available':
+            available_count += 1
+            if vol['CreateTime'] < threshold_time:
+                stale_ids.append(vol['VolumeId'])
+
+    # Region metrics are published in one batch from the dashboard region and
+    # share the invocation time as their timestamp
+    metric_data = [
+        {
+            'MetricName': 'TotalVolumeCount',
+            'Dimensions': [{'Name': 'Region', 'Value': region}],
+            'Value': total_count,
+            'Unit': 'Count',
+            'Timestamp': current_time
+        },
+        {
+            'MetricName': 'AvailableVolumeCount',
+            'Dimensions': [{'Name': 'Region', 'Value': region}],
+            'Value': available_count,
+            'Unit': 'Count',
+            'Timestamp': current_time
+        }
+    ]
+
+    return {
+        'region': region,
+        'total_count': total_count,
+        'available_count': available_count,
+        'stale_ids': stale_ids,
+        'deleted': [],
+        'metric_data': metric_data
+    }
+
+def process_region(region, ec2, current_time, threshold_time):
+    # Stream all volumes from the paginator (500 is the largest page EC2 allows)
+    pages = ec2.get_paginator('describe_volumes').paginate(PaginationConfig={'PageSize': 500})
+    result = summarize_region(region, (vol for page in pages for vol in page['Volumes']), current_time, threshold_time)
+    stale_ids = result['stale_ids']
+
+    # Delete stale volumes based on flags
+    if not NOTIFY_ONLY and stale_ids:
+        if not DRY_RUN:
+            # Actually delete the volumes, several at a time
+            def delete_volume(volume_id):
+                try:
+                    ec2.delete_volume(VolumeId=volume_id)
+                    return f"{region}: {volume_id} - DELETED"
+                except Exception as e:
+                    return f"{region}: {volume_id} - ERROR: {str(e)}"
+
+            with ThreadPoolExecutor(max_workers=MAX_DELETE_WORKERS) as executor:
+                result['deleted'] = list(executor.map(delete_volume, stale_ids))
+        else:
+            # Dry run - just log what would be deleted
+            result['deleted'] = [f"{region}: {volume_id} - WOULD BE DELETED (Dry Run)" for volume_id in stale_ids]
+
+    return result
 
-cloudwatch_main = boto3.client('cloudwatch', region_name=REGION)
-sns = boto3.client('sns', region_name=REGION)
+async def process_region_async(session, region, current_time, threshold_time):
+    async with session.client('ec2', region_name=region, config=ASYNC_BOTO_CONFIG) as ec2:
+        # Get all volumes (500 is the largest page EC2 allows)
+        pages = ec2.get_paginator('describe_volumes').paginate(PaginationConfig={'PageSize': 500})
+        all_volumes = [vol async for page in pages for vol in page['Volumes']]
+        result = summarize_region(region, all_volumes, current_time, threshold_time)
+        stale_ids = result['stale_ids']
+
+        # Delete stale volumes based on flags
+        if not NOTIFY_ONLY and stale_ids:
+            if not DRY_RUN:
+                # Actually delete the volumes, several at a time
+                semaphore = asyncio.Semaphore(MAX_DELETE_WORKERS)
+
+                async def delete_volume(volume_id):
+                    async with semaphore:
+                        try:
+                            await ec2.delete_volume(VolumeId=volume_id)
+                            return f"{region}: {volume_id} - DELETED"
+                        except Exception as e:
+                            return f"{region}: {volume_id} - ERROR: {str(e)}"
+
+                result['deleted'] = list(await asyncio.gather(*(delete_volume(vid) for vid in stale_ids)))
+            else:
+                # Dry run - just log what would be deleted
+                result['deleted'] = [f"{region}: {volume_id} - WOULD BE DELETED (Dry Run)" for volume_id in stale_ids]
+
+    return result
+
+async def process_regions_async(regions, current_time, threshold_time):
+    session = aioboto3.Session()
+    return await asyncio.gather(*(process_region_async(session, r, current_time, threshold_time) for r in regions))
 
 def lambda_handler(event, context):
-    ec2_global = boto3.client('ec2', region_name=REGION)
-    regions = [r['RegionName'] for r in ec2_global.describe_regions()['Regions']]
+    global _REGIONS_CACHE
+    # An explicit region list (event override, then DEFAULT_REGIONS) skips describe_regions
+    regions = (event or {}).get('regions') or DEFAULT_REGIONS
+    if isinstance(regions, str):
+        regions = [regions]
+    if not isinstance(regions, (list, tuple)) or not all(isinstance(r, str) for r in regions):
+        raise ValueError(f"'regions' must be a region name or a list of region names, got {regions!r}")
+    if not regions and _REGIONS_CACHE is None:
+        ec2_global = ec2_for(REGION)
+        # describe_regions already omits disabled regions unless AllRegions=True; the
+        # opt-in filter just makes that explicit
+        enabled_regions = ec2_global.describe_regions(
+            Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+        )
+        _REGIONS_CACHE = [r['RegionName'] for r in enabled_regions['Regions']]
+    regions = list(regions or _REGIONS_CACHE)
 
     total_volumes_global = 0
     total_available_global = 0
     total_stale_global = 0
     stale_volume_ids_all = []
     deleted_volumes = []
+    metric_data = []
 
-    # Calculate the threshold date
+    # Read the clock once: current_time stamps metrics and reports, threshold_time marks stale volumes
     current_time = datetime.now(timezone.utc)
     threshold_time = current_time - timedelta(days=STALE_DAYS_THRESHOLD)
 
     widgets = []
 
-    for region in regions:
-        ec2 = boto3.client('ec2', region_name=region)
-        cloudwatch = boto3.client('cloudwatch', region_name=region)
-
-        # Get all volumes
-        all_volumes = ec2.describe_volumes()
-        total_count = len(all_volumes['Volumes'])
+    # Regions are I/O bound, so process them concurrently (results keep region order)
+    if aioboto3 is not None:
+        results = asyncio.run(process_regions_async(regions, current_time, threshold_time))
+    else:
+        # boto3 sessions are not thread-safe, so clients are created here and
+        # workers only call methods on them
+        clients = {r: ec2_for(r) for r in regions}
+        with ThreadPoolExecutor(max_workers=MAX_REGION_WORKERS) as executor:
+            results = list(executor.map(lambda r: process_region(r, clients[r], current_time, threshold_time), regions))
 
-        # Get unattached volumes
-        available_volumes = ec2.describe_volumes(
-            Filters=[{'Name': 'status', 'Values': ['available']}]
-        )
-        available_count = len(available_volumes['Volumes'])
+    for row, result in enumerate(results):
+        region = result['region']
+        stale_ids = result['stale_ids']
 
-        # Filter stale volumes based on age
-        stale_ids = []
-        for vol in available_volumes['Volumes']:
-            if vol['CreateTime'] < threshold_time:
-                stale_ids.append(vol['VolumeId'])
-        
-        # Delete stale volumes based on flags
-        region_deleted_volumes = []
-        if not NOTIFY_ONLY and stale_ids:
-            for volume_id in stale_ids:
-                try:
-                    if not DRY_RUN:
-                        # Actually delete the volume
-                        ec2.delete_volume(VolumeId=volume_id)
-                        deleted_message = f"{region}: {volume_id} - DELETED"
-                    else:
-                        # Dry run - just log what would be deleted
-                        deleted_message = f"{region}: {volume_id} - WOULD BE DELETED (Dry Run)"
-                    
-                    region_deleted_volumes.append(deleted_message)
-                    deleted_volumes.append(deleted_message)
-                except Exception as e:
-                    error_message = f"{region}: {volume_id} - ERROR: {str(e)}"
-                    region_deleted_volumes.append(error_message)
-                    deleted_volumes.append(error_message)
-        
         # Add region info for stale volumes
-        stale_volume_ids_all.extend([f"{region}: {vid}" for vid in stale_ids])
+        stale_volume_ids_all.extend(f"{region}: {vid}" for vid in stale_ids)
+        deleted_volumes.extend(result['deleted'])
+        metric_data.extend(result['metric_data'])
 
-        total_volumes_global += total_count
-        total_available_global += available_count
+        total_volumes_global += result['total_count']
+        total_available_global += result['available_count']
         total_stale_global += len(stale_ids)
 
-        timestamp = time.time()
-        cloudwatch.put_metric_data(
-            Namespace='Custom/EBSMetrics',
-            MetricData=[
-                {
-                    'MetricName': 'TotalVolumeCount',
-                    'Dimensions': [{'Name': 'Region', 'Value': region}],
-                    'Value': total_count,
-                    'Unit': 'Count',
-                    'Timestamp': timestamp
-                },
-                {
-                    'MetricName': 'AvailableVolumeCount',
-                    'Dimensions': [{'Name': 'Region', 'Value': region}],
-                    'Value': available_count,
-                    'Unit': 'Count',
-                    'Timestamp': timestamp
-                }
-            ]
-        )
-
-        # Add region widget
+        # Add region widgets side by side, one row per region (metrics are all
+        # published from the dashboard region)
         widgets.append({
             "type": "metric",
             "x": 0,
-            "y": len(widgets) * 6,
+            "y": row * 6,
             "width": 6,
             "height": 6,
             "properties": {
                 "metrics": [["Custom/EBSMetrics", "TotalVolumeCount", "Region", region]],
                 "view": "singleValue",
                 "stat": "Average",
-                "region": region,
+                "region": REGION,
                 "title": f"Total Volumes - {region}"
             }
         })
@@ -115,50 +257,65 @@ def lambda_handler(event, context):
         widgets.append({
             "type": "metric",
             "x": 6,
-            "y": len(widgets) * 6,
+            "y": row * 6,
             "width": 6,
             "height": 6,
             "properties": {
                 "metrics": [["Custom/EBSMetrics", "AvailableVolumeCount", "Region", region]],
                 "view": "singleValue",
                 "stat": "Average",
-                "region": region,
+                "region": REGION,
                 "title": f"Stale Volumes - {region}"
             }
         })
 
+    # Publish all region metrics with as few PutMetricData calls as possible
+    for chunk in _chunks(metric_data, MAX_METRIC_DATA_PER_CALL):
+        cloudwatch_main.put_metric_data(Namespace='Custom/EBSMetrics', MetricData=chunk)
+
+    # Report text is built once and shared by the dashboard and the email
+    execution_mode = 'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')
+
     # Text widget for all stale volume IDs
     stale_volume_list_str = '\n'.join(stale_volume_ids_all) if stale_volume_ids_all else "No stale volumes."
     
     # Text widget for deletion results
     deletion_results_str = '\n'.join(deleted_volumes) if deleted_volumes else "No volumes were deleted."
 
+    # Dashboard excerpts of the report lists (full lists go to S3 when configured)
+    stale_volume_inline_str, stale_volume_more_str = dashboard_excerpt(
+        stale_volume_ids_all, stale_volume_list_str, "No stale volumes.", 'stale-volumes', current_time
+    )
+    deletion_results_inline_str, deletion_results_more_str = dashboard_excerpt(
+        deleted_volumes, deletion_results_str, "No volumes were deleted.", 'deletion-results', current_time
+    )
+
     widgets.append({
         "type": "text",
         "x": 0,
-        "y": len(widgets) * 6,
+        "y": len(results) * 6,
         "width": 12,
         "height": 6,
         "properties": {
-            "markdown": f"### Stale EBS Volume IDs Across Regions\n```\n{stale_volume_list_str}\n```"
+            "markdown": f"### Stale EBS Volume IDs Across Regions\n```\n{stale_volume_inline_str}\n```{stale_volume_more_str}"
         }
     })
     
     widgets.append({
         "type": "text",
         "x": 0,
-        "y": len(widgets) * 6,
+        "y": len(results) * 6 + 6,
         "width": 12,
         "height": 6,
         "properties": {
-            "markdown": f"### Deletion Results\n**Mode:** {'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')}\n```\n{deletion_results_str}\n```"
+            "markdown": f"### Deletion Results\n**Mode:** {execution_mode}\n```\n{deletion_results_inline_str}\n```{deletion_results_more_str}"
         }
     })
 
     # Email body
     email_body = f"""Stale EBS Volume Report (Across All Regions)
 
-Execution Mode: {'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')}
+Execution Mode: {execution_mode}
 
 Total EBS Volumes: {total_volumes_global}
 Available (Unattached) Volumes: {total_available_global}
@@ -178,7 +335,7 @@ Deletion Results:
     )
 
     # Publish dashboard in default region
-    dashboard_body = json.dumps({"widgets": widgets})
+    dashboard_body = orjson.dumps({"widgets": widgets}).decode() if orjson else json.dumps({"widgets": widgets})
     cloudwatch_main.put_dashboard(
         DashboardName="Global-EBSVolumeDashboard",
         DashboardBody=dashboard_body
@@ -186,5 +343,5 @@ Deletion Results:
 
     return {
         'statusCode': 200,
-        'body': f'Dashboard updated. Total: {total_volumes_global}, Available: {total_available_global}, Stale: {total_stale_global}, Mode: {"NOTIFY ONLY" if NOTIFY_ONLY else ("DRY RUN" if DRY_RUN else "ACTIVE DELETION")}'
+        'body': f'Dashboard updated. Total: {total_volumes_global}, Available: {total_available_global}, Stale: {total_stale_global}, Mode: {execution_mode}'
     }
\ No newline at end of file
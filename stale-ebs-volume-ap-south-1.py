@@ -1,59 +1,111 @@
 import boto3
 import json
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-
-sns = boto3.client('sns')
+from botocore.config import Config
+
+try:
+    # Optional: faster dashboard serialization
+    import orjson
+except ImportError:
+    orjson = None
+
+# Shared client config: a larger connection pool for the delete workers, kept-alive
+# connections across warm starts and adaptive retries to absorb throttling
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+sns = boto3.client('sns', config=BOTO_CONFIG)
 SNS_TOPIC_ARN = 'arn:aws:sns:ap-south-1:970378220457:stale-ebs-topic'  
 
-ec2 = boto3.client('ec2')
-cloudwatch = boto3.client('cloudwatch')
+ec2 = boto3.client('ec2', config=BOTO_CONFIG)
+cloudwatch = boto3.client('cloudwatch', config=BOTO_CONFIG)
+s3 = boto3.client('s3', config=BOTO_CONFIG)
 
 # Configuration flags
 DRY_RUN = True # Set to True to test without deleting
 NOTIFY_ONLY = True  # Set to True to only notify without deleting
 STALE_DAYS_THRESHOLD = 7 # Days threshold for identifying stale volumes
+MAX_DELETE_WORKERS = 20 # Volume deletions issued concurrently
+REPORT_BUCKET = '' # S3 bucket for the full stale volume and deletion lists; empty = dashboard shows truncated lists only
+REPORT_PREFIX = 'stale-ebs-reports/' # Key prefix for reports written to REPORT_BUCKET
+MAX_INLINE_REPORT_LINES = 50 # Stale volume IDs / deletion results shown directly on the dashboard
+
+def upload_report(body, report_name, report_time):
+    # Store a full report list in S3 and return a console link to it
+    key = f"{REPORT_PREFIX}{report_time:%Y-%m-%dT%H-%M-%SZ}-{report_name}.txt"
+    s3.put_object(Bucket=REPORT_BUCKET, Key=key, Body=body.encode(), ContentType='text/plain')
+    return f"https://s3.console.aws.amazon.com/s3/object/{REPORT_BUCKET}?prefix={key}"
+
+def dashboard_excerpt(lines, full_str, empty_message, report_name, report_time):
+    # Dashboard shows the first lines only; the full list is linked from S3 when configured
+    if not lines:
+        return empty_message, ""
+    hidden_count = len(lines) - MAX_INLINE_REPORT_LINES
+    if hidden_count <= 0:
+        return full_str, ""
+    more_str = f"\n{hidden_count} more not shown."
+    if REPORT_BUCKET:
+        # The S3 report is optional, so a failed upload must not fail the run
+        try:
+            more_str += f" [View full list]({upload_report(full_str, report_name, report_time)})"
+        except Exception as e:
+            print(f"Could not upload {report_name} report to S3: {str(e)}")
+    return '\n'.join(lines[:MAX_INLINE_REPORT_LINES]), more_str
+
+def delete_volume(volume_id):
+    try:
+        ec2.delete_volume(VolumeId=volume_id)
+        return f"{volume_id} - DELETED"
+    except Exception as e:
+        return f"{volume_id} - ERROR: {str(e)}"
 
 def lambda_handler(event, context):
-    # Step 1: Count total EBS volumes
-    all_volumes = ec2.describe_volumes()
-    total_count = len(all_volumes['Volumes'])
-
-    # Step 2: Get and count available (unattached) EBS volumes
-    available_volumes = ec2.describe_volumes(
-        Filters=[{'Name': 'status', 'Values': ['available']}]
-    )
-    available_count = len(available_volumes['Volumes'])
-
-    # Calculate the threshold date
+    # Calculate the threshold date (current_time is also the metric timestamp)
     current_time = datetime.now(timezone.utc)
     threshold_time = current_time - timedelta(days=STALE_DAYS_THRESHOLD)
 
-    # Get list of stale EBS volume IDs (created more than 7 days ago)
+    # Steps 1-2: Count total and available (unattached) EBS volumes, and collect
+    # stale volume IDs (created more than 7 days ago), in one paginated pass
+    # (500 is the largest page EC2 allows)
+    total_count = 0
+    available_count = 0
     stale_volume_ids = []
-    for vol in available_volumes['Volumes']:
-        if vol['CreateTime'] < threshold_time:
-            stale_volume_ids.append(vol['VolumeId'])
+    pages = ec2.get_paginator('describe_volumes').paginate(PaginationConfig={'PageSize': 500})
+    for page in pages:
+        for vol in page['Volumes']:
+            total_count += 1
+            if vol['State'] == 'available':
+                available_count += 1
+                if vol['CreateTime'] < threshold_time:
+                    stale_volume_ids.append(vol['VolumeId'])
 
     stale_volume_list_str = '\n'.join(stale_volume_ids) if stale_volume_ids else "No stale volumes."
 
     # Step 3: Delete stale volumes based on flags
     deletion_results = []
     if not NOTIFY_ONLY and stale_volume_ids:
-        for volume_id in stale_volume_ids:
-            try:
-                if not DRY_RUN:
-                    # Actually delete the volume
-                    ec2.delete_volume(VolumeId=volume_id)
-                    deletion_results.append(f"{volume_id} - DELETED")
-                else:
-                    # Dry run - just log what would be deleted
-                    deletion_results.append(f"{volume_id} - WOULD BE DELETED (Dry Run)")
-            except Exception as e:
-                deletion_results.append(f"{volume_id} - ERROR: {str(e)}")
+        if not DRY_RUN:
+            # Actually delete the volumes, several at a time
+            with ThreadPoolExecutor(max_workers=MAX_DELETE_WORKERS) as executor:
+                deletion_results = list(executor.map(delete_volume, stale_volume_ids))
+        else:
+            # Dry run - just log what would be deleted
+            deletion_results = [f"{volume_id} - WOULD BE DELETED (Dry Run)" for volume_id in stale_volume_ids]
     
     # Format deletion results for display
     deletion_results_str = '\n'.join(deletion_results) if deletion_results else "No volumes were deleted."
+
+    # Dashboard excerpts of the report lists (full lists go to S3 when configured)
+    stale_volume_inline_str, stale_volume_more_str = dashboard_excerpt(
+        stale_volume_ids, stale_volume_list_str, "No stale volumes.", 'stale-volumes', current_time
+    )
+    deletion_results_inline_str, deletion_results_more_str = dashboard_excerpt(
+        deletion_results, deletion_results_str, "No volumes were deleted.", 'deletion-results', current_time
+    )
     
     # Step 4: Push custom metrics to CloudWatch
     cloudwatch.put_metric_data(
@@ -63,17 +115,20 @@ def lambda_handler(event, context):
                 'MetricName': 'TotalVolumeCount',
                 'Value': total_count,
                 'Unit': 'Count',
-                'Timestamp': time.time()
+                'Timestamp': current_time
             },
             {
                 'MetricName': 'AvailableVolumeCount',
                 'Value': available_count,
                 'Unit': 'Count',
-                'Timestamp': time.time()
+                'Timestamp': current_time
             }
         ]
     )
 
+    # Report text is built once and shared by the dashboard and the email
+    execution_mode = 'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')
+
     # Step 5: Create widgets for dashboard (counts and text)
     widgets = [
         {
@@ -111,7 +166,7 @@ def lambda_handler(event, context):
             "width": 12,
             "height": 3,
             "properties": {
-                "markdown": f"### Stale EBS Volume IDs\n```\n{stale_volume_list_str}\n```"
+                "markdown": f"### Stale EBS Volume IDs\n```\n{stale_volume_inline_str}\n```{stale_volume_more_str}"
             }
         },
         {
@@ -121,7 +176,7 @@ def lambda_handler(event, context):
             "width": 12,
             "height": 3,
             "properties": {
-                "markdown": f"### Deletion Results\n**Mode:** {'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')}\n```\n{deletion_results_str}\n```"
+                "markdown": f"### Deletion Results\n**Mode:** {execution_mode}\n```\n{deletion_results_inline_str}\n```{deletion_results_more_str}"
             }
         }
     ]
@@ -129,7 +184,7 @@ def lambda_handler(event, context):
     # Step 6: Email report using SNS
     email_body = f"""Stale EBS Volume Report
 
-Execution Mode: {'NOTIFY ONLY' if NOTIFY_ONLY else ('DRY RUN' if DRY_RUN else 'ACTIVE DELETION')}
+Execution Mode: {execution_mode}
 
 Total EBS Volumes: {total_count}
 Available (Unattached) Volumes: {available_count}
@@ -149,7 +204,7 @@ Deletion Results:
     )
 
     # Step 7: Update the dashboard
-    dashboard_body = json.dumps({"widgets": widgets})
+    dashboard_body = orjson.dumps({"widgets": widgets}).decode() if orjson else json.dumps({"widgets": widgets})
 
     cloudwatch.put_dashboard(
         DashboardName="EBSVolumeDashboard",
@@ -158,5 +213,5 @@ Deletion Results:
 
     return {
         'statusCode': 200,
-        'body': f'Dashboard updated. Total: {total_count}, Available: {available_count}, Mode: {"NOTIFY ONLY" if NOTIFY_ONLY else ("DRY RUN" if DRY_RUN else "ACTIVE DELETION")}'
+        'body': f'Dashboard updated. Total: {total_count}, Available: {available_count}, Mode: {execution_mode}'
     }
\ No newline at end of file